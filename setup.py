@@ -9,5 +9,6 @@ setup(
     ],
     tests_require=[
         'pytest',
+        'pytest-xdist',
     ]
 )
@@ -1,25 +1,128 @@
 import os
-import tempfile
+import sqlite3
 import pytest
 from flaskr import app, init_db
 
+# Named shared-cache in-memory database, one per pytest-xdist worker.
+TEST_DATABASE = 'file:flaskr_{}?mode=memory&cache=shared'
+
+
+class RollbackConnection(sqlite3.Connection):
+    """Connection shared by the app and the tests for the whole session.
+
+    ``commit()`` and ``close()`` are no-ops so that writes made by the views
+    stay inside the per-test transaction opened by the ``db`` fixture, and
+    so that the in-memory database outlives every application context.
+    """
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_test_db = None
+
+
+def connect_test_db():
+    """Returns the connection to the in-memory test database."""
+    global _test_db
+    if _test_db is None:
+        _test_db = sqlite3.connect(app.config['DATABASE'], uri=True,
+                                   check_same_thread=False,
+                                   factory=RollbackConnection)
+        _test_db.row_factory = sqlite3.Row
+        # The test database is throwaway, so trade durability for speed.
+        _test_db.executescript(
+            'PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF; '
+            'PRAGMA temp_store=MEMORY; PRAGMA locking_mode=EXCLUSIVE;'
+        )
+    return _test_db
+
+
+@pytest.fixture(scope='session', autouse=True)
+def memory_db():
+    """Point the app at this worker's in-memory database for the session."""
+    global _test_db
+    # Set by pytest-xdist in its workers; a plain pytest run has no workers
+    worker_id = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(app.config, 'DATABASE', TEST_DATABASE.format(worker_id))
+        mp.setattr('flaskr.flaskr.connect_db', connect_test_db)
+        yield
+    # close() is a no-op for the app, so release the connection here
+    if _test_db is not None:
+        sqlite3.Connection.close(_test_db)
+        _test_db = None
+
+
+@pytest.fixture(scope='session')
+def _schema(memory_db):
+    """Create the schema once for the whole session."""
+    with app.app_context():
+        init_db()
+
+
+@pytest.fixture(autouse=True)
+def db(_schema):
+    """Run each test inside a transaction that is rolled back afterwards.
+
+    ``executescript()`` commits the open transaction first, so tests that run
+    scripts such as ``init_db()`` need a database of their own.
+    """
+    conn = connect_test_db()
+    conn.execute('BEGIN')
+    yield conn
+    conn.rollback()
+
 
 @pytest.fixture
-def client():
-    """Create a test client for the app."""
-    db_fd, app.config['DATABASE'] = tempfile.mkstemp()
+def entry_id(db):
+    """Insert an entry inside the test's transaction and return its id."""
+    return db.execute(
+        'INSERT INTO entries (title, text) VALUES (?, ?)',
+        ['Test Entry', 'This is a test entry.']
+    ).lastrowid
+
+
+@pytest.fixture(scope='class')
+def ctx():
+    """Push a single application context for the whole test class."""
+    with app.app_context() as ctx:
+        yield ctx
+
+
+@pytest.fixture(scope='class')
+def client(ctx):
+    """Create a test client shared by the whole test class."""
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False
     app.config['USERNAME'] = 'admin'
     app.config['PASSWORD'] = 'default'
 
-    with app.test_client() as client:
-        with app.app_context():
-            init_db()
-        yield client
+    # Not entered as a context manager, so no request context outlives a test
+    yield app.test_client()
+
+
+@pytest.fixture
+def app_config(monkeypatch):
+    """Return a helper that overrides app config values for one test.
 
-    os.close(db_fd)
-    os.unlink(app.config['DATABASE'])
+    The overrides are restored when the test finishes.
+    """
+    def _app_config(**config):
+        for key, value in config.items():
+            monkeypatch.setitem(app.config, key, value)
+    return _app_config
+
+
+@pytest.fixture(autouse=True)
+def _logged_out(request):
+    """Start every test that uses the shared client without a session."""
+    if 'client' in request.fixturenames:
+        client = request.getfixturevalue('client')
+        client.delete_cookie(app.config['SESSION_COOKIE_NAME'])
 
 
 @pytest.fixture
@@ -39,5 +142,10 @@ class AuthActions:
             follow_redirects=True
         )
 
+    def login_fast(self):
+        """Mark the session as logged in without going through /login."""
+        with self.client.session_transaction() as sess:
+            sess['logged_in'] = True
+
     def logout(self):
         return self.client.get('/logout', follow_redirects=True)